@@ -1,6 +1,14 @@
 """Utility functions for creating Anki decks from card data."""
 
-from typing import Any
+import hashlib
+import itertools
+import json
+import os
+import sqlite3
+import tempfile
+import time
+import zipfile
+from typing import Any, BinaryIO
 
 import genanki
 
@@ -9,11 +17,71 @@ try:
     from .logger import get_logger
 except ImportError:
     # Fallback for script execution
-    from src.exceptions import AnkiDeckError  # type: ignore
-    from src.logger import get_logger  # type: ignore
+    from src.exceptions import AnkiDeckError
+    from src.logger import get_logger
 
 logger = get_logger(__name__)
 
+# List fields of a card and the separator used to join them into a note field.
+JOIN_SPECS = (
+    ("examples", "<br>"),
+    ("synonyms", ", "),
+    ("antonyms", ", "),
+    ("collocations", ", "),
+    ("russian", ", "),
+    ("topics", ", "),
+)
+
+
+def _stable_id(name: str) -> int:
+    """Derive a deck/model ID from a name that is the same in every process.
+
+    The built-in ``hash`` of a string is salted per process, which made Anki
+    treat every regenerated deck as a new one.
+    """
+    return int.from_bytes(hashlib.blake2b(name.encode(), digest_size=5).digest(), "big")
+
+
+_MODEL_NAME = "BasicOneCardRus"
+_MODEL_ID = _stable_id(_MODEL_NAME)
+_MODEL_FIELDS = [
+    {"name": "Expression"},
+    {"name": "Definition"},
+    {"name": "Examples"},
+    {"name": "Synonyms"},
+    {"name": "Antonyms"},
+    {"name": "Collocations"},
+    {"name": "PartOfSpeech"},
+    {"name": "Audio_Expression"},
+    {"name": "Audio_Definition"},
+    {"name": "Audio_Examples"},
+    {"name": "RussianTranslation"},
+    {"name": "Topics"},
+]
+_CARD_FRONT = "{{Expression}}"
+_CARD_BACK = (
+    '{{FrontSide}}<hr id="answer">'
+    "{{Audio_Expression}} <b>{{Expression}}</b><br>"
+    "Part of Speech: {{PartOfSpeech}}<br><br>"
+    "Russian: {{RussianTranslation}}<br>"
+    "{{Audio_Definition}} Definition: {{Definition}}<br><br>"
+    "{{Audio_Examples}} Examples: {{Examples}}<br><br>"
+    "Synonyms: {{Synonyms}}<br><br>"
+    "Antonyms: {{Antonyms}}<br><br>"
+    "Collocations: {{Collocations}}<br><br>"
+    "Topics: {{Topics}}"
+)
+
+# The note model is the same for every deck, so it is built once at import.
+_MODEL = genanki.Model(
+    model_id=_MODEL_ID,
+    name=_MODEL_NAME,
+    fields=_MODEL_FIELDS,
+    templates=[
+        {"name": "Card 1 (Word Front)", "qfmt": _CARD_FRONT, "afmt": _CARD_BACK}
+    ],
+)
+
 
 def create_anki_deck(
     cards_data: list[dict[str, Any]], deck_name: str = "My Vocabulary Deck"
@@ -45,111 +113,143 @@ def create_anki_deck(
         The constructed Anki deck.
 
     Raises:
-        AnkiDeckError: If deck creation fails
+        AnkiDeckError: If cards_data is empty
     """
     if not cards_data:
         logger.warning("No card data provided for deck creation")
         raise AnkiDeckError("Cannot create deck with empty card data")
 
-    try:
-        logger.info(f"Creating Anki deck '{deck_name}' with {len(cards_data)} cards")
-
-        deck_id = abs(hash(deck_name)) % (10**10)
-        deck = genanki.Deck(deck_id=deck_id, name=deck_name)
-
-        model = genanki.Model(
-            model_id=abs(hash("BasicOneCardRus")) % (10**10),
-            name="BasicOneCardRus",
-            fields=[
-                {"name": "Expression"},
-                {"name": "Definition"},
-                {"name": "Examples"},
-                {"name": "Synonyms"},
-                {"name": "Antonyms"},
-                {"name": "Collocations"},
-                {"name": "PartOfSpeech"},
-                {"name": "Audio_Expression"},
-                {"name": "Audio_Definition"},
-                {"name": "Audio_Examples"},
-                {"name": "RussianTranslation"},
-                {"name": "Topics"},
-            ],
-            templates=[
-                {
-                    "name": "Card 1 (Word Front)",
-                    "qfmt": "{{Expression}}",
-                    "afmt": (
-                        '{{FrontSide}}<hr id="answer">'
-                        "{{Audio_Expression}} <b>{{Expression}}</b><br>"
-                        "Part of Speech: {{PartOfSpeech}}<br><br>"
-                        "Russian: {{RussianTranslation}}<br>"
-                        "{{Audio_Definition}} Definition: {{Definition}}<br><br>"
-                        "{{Audio_Examples}} Examples: {{Examples}}<br><br>"
-                        "Synonyms: {{Synonyms}}<br><br>"
-                        "Antonyms: {{Antonyms}}<br><br>"
-                        "Collocations: {{Collocations}}<br><br>"
-                        "Topics: {{Topics}}"
-                    ),
-                }
-            ],
-        )
+    logger.info(f"Creating Anki deck '{deck_name}' with {len(cards_data)} cards")
+
+    deck = genanki.Deck(deck_id=_stable_id(deck_name), name=deck_name)
+
+    success_count = 0
+    for i, card in enumerate(cards_data):
+        try:
+            get = card.get
+            # Convert lists to strings; joining an empty list gives "". Text
+            # fields may be null in card data, which genanki cannot write.
+            joined = {key: sep.join(get(key) or ()) for key, sep in JOIN_SPECS}
+
+            note = genanki.Note(
+                model=_MODEL,
+                fields=[
+                    get("expression") or "",
+                    get("definition") or "",
+                    joined["examples"],
+                    joined["synonyms"],
+                    joined["antonyms"],
+                    joined["collocations"],
+                    get("part_of_speech") or "",
+                    get("audio_expression") or "",
+                    get("audio_definition") or "",
+                    get("audio_examples") or "",
+                    joined["russian"],
+                    joined["topics"],
+                ],
+            )
+            deck.add_note(note)
+            success_count += 1
+
+        except Exception as e:
+            logger.error(f"Failed to create note for card {i}: {e}")
+            continue
+
+    logger.info(
+        f"Successfully created deck with {success_count}/{len(cards_data)} cards"
+    )
+    return deck
+
+
+# Media formats that are already compressed and gain nothing from deflate.
+_PRECOMPRESSED_SUFFIXES = (".mp3", ".ogg", ".opus", ".m4a", ".jpg", ".jpeg", ".png")
+
+
+def _compress_type(path: str) -> int:
+    """Choose the zip compression for a media file based on its format."""
+    if path.lower().endswith(_PRECOMPRESSED_SUFFIXES):
+        return zipfile.ZIP_STORED
+    return zipfile.ZIP_DEFLATED
+
+
+def _prefetch(paths: list[str]) -> None:
+    """Ask the OS to start reading files into the page cache ahead of use.
+
+    The hints return immediately, so the reads of all files proceed in
+    parallel while earlier files are already being zipped. Platforms without
+    ``posix_fadvise`` (e.g. macOS) skip this.
+    """
+    if not hasattr(os, "posix_fadvise"):
+        return
+    for path in paths:
+        try:
+            fd = os.open(path, os.O_RDONLY)
+        except OSError:
+            continue  # Reported when the file is added to the archive.
+        try:
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_WILLNEED)
+        finally:
+            os.close(fd)
+
+
+class AnkiPackage(genanki.Package):  # type: ignore[misc]
+    """A genanki package that streams media files into the ``.apkg`` archive.
+
+    Media may be given as any iterable of paths, e.g. a generator. Each file is
+    copied into the archive by path, so it is read block by block rather than
+    held in memory. The temporary collection database is removed once the
+    archive is written, which genanki itself does not do.
+
+    Already compressed media (MP3, OGG, ...) is stored as is, while the
+    collection database and uncompressed media are deflated.
+    """
 
-        success_count = 0
-        for i, card in enumerate(cards_data):
+    def write_to_file(
+        self, file: str | os.PathLike[str] | BinaryIO, timestamp: float | None = None
+    ) -> None:
+        """Write the package to an ``.apkg`` file.
+
+        Args:
+            file: Path of the package to write, or a writable binary file object
+                such as ``io.BytesIO``.
+            timestamp: Timestamp assigned to the generated notes and cards.
+                Defaults to the current time.
+        """
+        # The same file given twice, e.g. through different relative paths or a
+        # symlink, is read and stored only once. The first path given is kept,
+        # since its name is the one the cards refer to.
+        unique_media: dict[str, str] = {}
+        for path in self.media_files:
+            unique_media.setdefault(os.path.realpath(path), path)
+        media_files = list(unique_media.values())
+        # Media is read from disk while the collection database is written.
+        _prefetch(media_files)
+
+        db_fd, db_path = tempfile.mkstemp(suffix=".anki2")
+        os.close(db_fd)
+        try:
+            conn = sqlite3.connect(db_path)
             try:
-                # Convert lists to strings with safe access
-                examples_str = (
-                    "<br>".join(card.get("examples", []))
-                    if card.get("examples")
-                    else ""
-                )
-                synonyms_str = (
-                    ", ".join(card.get("synonyms", [])) if card.get("synonyms") else ""
+                if timestamp is None:
+                    timestamp = time.time()
+                id_gen = itertools.count(int(timestamp * 1000))
+                self.write_to_db(conn.cursor(), timestamp, id_gen)
+                conn.commit()
+            finally:
+                conn.close()
+
+            with zipfile.ZipFile(file, "w") as out_zip:
+                out_zip.write(
+                    db_path, "collection.anki2", compress_type=zipfile.ZIP_DEFLATED
                 )
-                antonyms_str = (
-                    ", ".join(card.get("antonyms", [])) if card.get("antonyms") else ""
-                )
-                collocations_str = (
-                    ", ".join(card.get("collocations", []))
-                    if card.get("collocations")
-                    else ""
-                )
-                russian_str = (
-                    ", ".join(card.get("russian", [])) if card.get("russian") else ""
-                )
-                topics_str = (
-                    ", ".join(card.get("topics", [])) if card.get("topics") else ""
-                )
-
-                note = genanki.Note(
-                    model=model,
-                    fields=[
-                        card.get("expression", ""),
-                        card.get("definition", ""),
-                        examples_str,
-                        synonyms_str,
-                        antonyms_str,
-                        collocations_str,
-                        card.get("part_of_speech", ""),
-                        card.get("audio_expression", ""),
-                        card.get("audio_definition", ""),
-                        card.get("audio_examples", ""),
-                        russian_str,
-                        topics_str,
-                    ],
+                media_json = {
+                    str(idx): os.path.basename(path)
+                    for idx, path in enumerate(media_files)
+                }
+                out_zip.writestr(
+                    "media", json.dumps(media_json), compress_type=zipfile.ZIP_DEFLATED
                 )
-                deck.add_note(note)
-                success_count += 1
-
-            except Exception as e:
-                logger.error(f"Failed to create note for card {i}: {e}")
-                continue
-
-        logger.info(
-            f"Successfully created deck with {success_count}/{len(cards_data)} cards"
-        )
-        return deck
-
-    except Exception as e:
-        logger.error(f"Failed to create Anki deck: {e}")
-        raise AnkiDeckError(f"Failed to create Anki deck: {e}") from e
+                for idx, path in enumerate(media_files):
+                    out_zip.write(path, str(idx), compress_type=_compress_type(path))
+        finally:
+            os.remove(db_path)
@@ -1,13 +1,64 @@
 """Utility functions for text-to-speech conversion to voice cards text."""
 
+import asyncio
+import hashlib
 import os
+import shutil
 
+import httpx
 from dotenv import load_dotenv
-from elevenlabs import ElevenLabs, save
+from elevenlabs import AsyncElevenLabs, ElevenLabs
 from gtts import gTTS
 
+try:
+    from .logger import get_logger
+except ImportError:
+    # Fallback for script execution
+    from src.logger import get_logger
+
 load_dotenv()
 
+logger = get_logger(__name__)
+
+ELEVENLABS_VOICE_ID = "onwK4e9ZLuTAKqWW03F9"  # Daniel's voice ID
+ELEVENLABS_MODEL_ID = "eleven_turbo_v2_5"  # Model ID for Turbo v2.5
+# Connection pool shared by all requests of a TextToSpeech instance.
+HTTP_LIMITS = httpx.Limits(max_keepalive_connections=32)
+HTTP_TIMEOUT = 60
+AUDIO_DIR = "data/audio"
+
+
+def _audio_path(
+    text: str,
+    audio_format: str = "mp3",
+    voice: str = f"{ELEVENLABS_VOICE_ID}|{ELEVENLABS_MODEL_ID}",
+) -> str:
+    """Return the content-addressed path of the audio file for a text.
+
+    The name is a hash of the voice (by default the ElevenLabs voice and model)
+    and the text, so identical texts share one file across cards and runs and
+    are only synthesized once.
+    """
+    key = f"{voice}|{text}".encode()
+    digest = hashlib.blake2b(key, digest_size=8).hexdigest()
+    return os.path.join(AUDIO_DIR, f"{digest}.{audio_format}")
+
+
+def _place_audio(cached_path: str, filename: str | None) -> str:
+    """Make a cached audio file available under the requested filename.
+
+    The file is hard-linked where possible, so no audio data is duplicated,
+    and copied otherwise (e.g. across file systems).
+    """
+    if not filename or filename == cached_path:
+        return cached_path
+    if not os.path.exists(filename):
+        try:
+            os.link(cached_path, filename)
+        except OSError:
+            shutil.copyfile(cached_path, filename)
+    return filename
+
 
 class TextToSpeech:
     """Class to convert text to speech using gTTS and ElevenLabs.
@@ -16,8 +67,28 @@ class TextToSpeech:
     """
 
     def __init__(self) -> None:
-        """Initialize the TextToSpeech client with the ElevenLabs API key."""
-        self.client = ElevenLabs(api_key=os.getenv("ELEVENLABS_API_KEY"))
+        """Initialize the TextToSpeech clients with the ElevenLabs API key.
+
+        Both clients keep a persistent HTTP/2 connection pool, so consecutive
+        requests reuse one TLS session instead of opening a new one each time.
+        """
+        api_key = os.getenv("ELEVENLABS_API_KEY")
+        self._http = httpx.Client(http2=True, timeout=HTTP_TIMEOUT, limits=HTTP_LIMITS)
+        self._async_http = httpx.AsyncClient(
+            http2=True, timeout=HTTP_TIMEOUT, limits=HTTP_LIMITS
+        )
+        self.client = ElevenLabs(api_key=api_key, httpx_client=self._http)
+        self.async_client = AsyncElevenLabs(
+            api_key=api_key, httpx_client=self._async_http
+        )
+
+    def close(self) -> None:
+        """Close the synchronous HTTP connection pool."""
+        self._http.close()
+
+    async def aclose(self) -> None:
+        """Close the asynchronous HTTP connection pool."""
+        await self._async_http.aclose()
 
     def text_to_speech_gtts(
         self, text: str, filename: str, language: str = "en"
@@ -37,26 +108,111 @@ class TextToSpeech:
         tts.save(filename)
         return filename
 
-    def text_to_speech_elevenlabs(self, text: str, filename: str) -> str:
-        """Convert text to speech using ElevenLabs and save as an MP3 file.
+    async def text_to_speech_gtts_async(
+        self, text: str, filename: str | None = None, language: str = "en"
+    ) -> str:
+        """Asynchronously convert text to speech using gTTS and save as an MP3 file.
 
+        gTTS is blocking, so each request runs in a worker thread and many can
+        be in flight at once. Audio is stored under a hash of the language and
+        the text and reused like in text_to_speech_elevenlabs.
         Returns the filename of the MP3 file.
         If text is empty, returns an empty string.
         """
-        if os.path.exists(filename):
+        if isinstance(text, list):
+            text = " ".join(text)
+
+        if not text:
+            return ""
+
+        if filename and os.path.exists(filename):
+            logger.debug(f"Reusing audio {filename}")
             return filename
+        cached_path = _audio_path(text, voice=f"gtts|{language}")
+        if os.path.exists(cached_path):
+            logger.debug(f"Reusing audio {cached_path}")
+            return _place_audio(cached_path, filename)
+
+        tts = gTTS(text=text, lang=language)
+        partial_filename = f"{cached_path}.part"
+        await asyncio.to_thread(tts.save, partial_filename)
+        os.replace(partial_filename, cached_path)
+        return _place_audio(cached_path, filename)
+
+    def text_to_speech_elevenlabs(
+        self, text: str, filename: str | None = None, audio_format: str = "mp3"
+    ) -> str:
+        """Convert text to speech using ElevenLabs and save as an MP3 file.
+
+        Audio is stored under a hash of the text and reused for every later
+        request of the same text; with a filename, it is also linked there.
+        Returns the filename of the MP3 file.
+        If text is empty, returns an empty string.
+        """
+        if isinstance(text, list):
+            text = " ".join(text)
 
         if not text:
             return ""
 
+        if filename and os.path.exists(filename):
+            logger.debug(f"Reusing audio {filename}")
+            return filename
+        cached_path = _audio_path(text, audio_format)
+        if os.path.exists(cached_path):
+            logger.debug(f"Reusing audio {cached_path}")
+            return _place_audio(cached_path, filename)
+
+        # The streaming endpoint starts sending audio while it is still being
+        # generated; chunks go straight to disk instead of being buffered.
+        audio = self.client.text_to_speech.stream(
+            voice_id=ELEVENLABS_VOICE_ID,
+            model_id=ELEVENLABS_MODEL_ID,
+            text=text,
+        )
+
+        partial_filename = f"{cached_path}.part"
+        with open(partial_filename, "wb") as f:
+            for chunk in audio:
+                f.write(chunk)
+        os.replace(partial_filename, cached_path)
+        return _place_audio(cached_path, filename)
+
+    async def text_to_speech_elevenlabs_async(
+        self, text: str, filename: str | None = None, audio_format: str = "mp3"
+    ) -> str:
+        """Asynchronously convert text to speech using ElevenLabs and save as an MP3 file.
+
+        Audio chunks are written to disk as they arrive, so many requests can be
+        in flight at once. Audio is stored under a hash of the text and reused
+        like in text_to_speech_elevenlabs. Returns the filename of the MP3 file.
+        If text is empty, returns an empty string.
+        """
         if isinstance(text, list):
             text = " ".join(text)
 
-        audio = self.client.text_to_speech.convert(
-            voice_id="onwK4e9ZLuTAKqWW03F9",  # Daniel's voice ID
-            model_id="eleven_turbo_v2_5",  # Model ID for Turbo v2.5
+        if not text:
+            return ""
+
+        if filename and os.path.exists(filename):
+            logger.debug(f"Reusing audio {filename}")
+            return filename
+        cached_path = _audio_path(text, audio_format)
+        if os.path.exists(cached_path):
+            logger.debug(f"Reusing audio {cached_path}")
+            return _place_audio(cached_path, filename)
+
+        audio = self.async_client.text_to_speech.convert(
+            voice_id=ELEVENLABS_VOICE_ID,
+            model_id=ELEVENLABS_MODEL_ID,
             text=text,
         )
 
-        save(audio, filename)  # To save the audio to a file
-        return filename
+        # Write to a temporary file first so an interrupted download is not
+        # mistaken for a finished one on the next run.
+        partial_filename = f"{cached_path}.part"
+        with open(partial_filename, "wb") as f:
+            async for chunk in audio:
+                f.write(chunk)
+        os.replace(partial_filename, cached_path)
+        return _place_audio(cached_path, filename)
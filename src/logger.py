@@ -0,0 +1,25 @@
+"""Logging configuration for the Anki Card Generator."""
+
+import logging
+import os
+import sys
+
+LOG_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+# Set LOG_LEVEL=DEBUG to also log the raw language model responses.
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+
+
+def get_logger(name: str) -> logging.Logger:
+    """Return a logger writing to stderr at the level set by ``LOG_LEVEL``.
+
+    The handler is attached once per logger, so repeated calls with the same
+    name do not duplicate output.
+    """
+    logger = logging.getLogger(name)
+    if not logger.handlers:
+        handler = logging.StreamHandler(sys.stderr)
+        handler.setFormatter(logging.Formatter(LOG_FORMAT))
+        logger.addHandler(handler)
+        logger.setLevel(LOG_LEVEL)
+        logger.propagate = False
+    return logger
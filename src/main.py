@@ -5,17 +5,55 @@ to derive card details and a text-to-speech service to create corresponding audi
 It produces JSON files with card data and an Anki package that includes audio references.
 """
 
+from __future__ import annotations
+
 import argparse
+import asyncio
+import hashlib
+import itertools
 import json
+import multiprocessing
 import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from typing import TYPE_CHECKING, Any
 
-import genanki
+import orjson
+from langchain_core.messages import SystemMessage
+from langchain_core.prompts import ChatPromptTemplate
 from langchain_openai import ChatOpenAI
-from llama_cpp import Llama
+from pydantic import BaseModel
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Iterator
+
+    from langchain_core.runnables import Runnable, RunnableConfig
+    from llama_cpp import Llama
+
+try:
+    from .anki_utils import AnkiPackage, create_anki_deck
+    from .audio_utils import TextToSpeech
+    from .logger import get_logger
+    from .nlp_utils import parse_words
+except ImportError:
+    # Fallback for script execution
+    from src.anki_utils import AnkiPackage, create_anki_deck
+    from src.audio_utils import TextToSpeech
+    from src.logger import get_logger
+    from src.nlp_utils import parse_words
+
+logger = get_logger(__name__)
 
-from anki_utils import create_anki_deck
-from audio_utils import TextToSpeech
-from nlp_utils import parse_words
+
+def _is_local(model: Llama | ChatOpenAI | str) -> bool:
+    """Tell whether a model is a local llama.cpp model rather than a remote one.
+
+    A string is the path of a local model that only worker processes load.
+
+    Checking against the remote client avoids importing ``llama_cpp`` when
+    only remote models are used.
+    """
+    return not isinstance(model, ChatOpenAI)
 
 
 def load_prompt() -> str:
@@ -29,132 +67,627 @@ def load_prompt() -> str:
     return prompt_data.get("user", "")
 
 
-class AnkiCardsGenerator:
-    """Generate Anki cards from words using a language model."""
+def available_cpus() -> int:
+    """Return the number of CPUs this process may run on."""
+    if hasattr(os, "sched_getaffinity"):
+        # Respects CPU affinity (e.g. taskset or docker --cpuset-cpus) on Linux,
+        # though not a CPU quota such as docker --cpus.
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
 
-    def __init__(self):
-        """Initialize the generator."""
-        self.model = None
-        self.device = "mps"
-        self.n_gpu_layers = 8
 
-    def generate_cards_from_words(
-        self, model_name, prompt: str, words_list: list[str], audio_format: str = "mp3"
-    ) -> list[dict]:
-        """Generate Anki cards from a list of words."""
-        return generate_cards_from_words(model_name, prompt, words_list, audio_format)
+def load_model(
+    model_name: str,
+    device: str = "mps",
+    n_gpu_layers: int = 8,
+    n_ctx: int = 8192,
+    n_threads: int | None = None,
+    n_threads_batch: int | None = None,
+    n_batch: int = 2048,
+    n_ubatch: int = 512,
+) -> Llama | ChatOpenAI:
+    """Load a local GGUF model from ``models/`` or create a client for a remote model.
 
+    Loading a local model maps the weights and allocates the KV cache, so the
+    returned instance should be reused for all expressions. ``n_batch`` is the
+    number of prompt tokens llama.cpp submits per decode call and ``n_ubatch``
+    the number it computes at once; a large ``n_batch`` lets the multi-KB prompt
+    be evaluated in a single call.
 
-def get_expression_card_info(model_name, prompt: str, expression: str) -> dict:
-    """Generate card information for a given expression by interacting with a language model."""
+    Token generation is limited by memory bandwidth and uses ``n_threads``, by
+    default half the available CPUs, while prompt evaluation is compute bound
+    and uses ``n_threads_batch``, by default ``n_threads`` if given and all
+    available CPUs otherwise.
+
+    ``llama_cpp`` loads its native library on import, so it is only imported
+    once a local model is actually requested.
+    """
     if model_name.startswith("models"):
-        model = Llama(
-            model_path=model_path,
-            n_ctx=8192,
+        from llama_cpp import Llama
+
+        cpus = available_cpus()
+        if n_threads_batch is None:
+            n_threads_batch = n_threads or cpus
+        if n_threads is None:
+            n_threads = max(1, cpus // 2)
+        return Llama(
+            model_path=model_name,
+            n_ctx=n_ctx,
             device=device,
             n_gpu_layers=n_gpu_layers if device in ("mps", "cuda") else 0,
+            n_threads=n_threads,
+            n_threads_batch=n_threads_batch,
+            n_batch=n_batch,
+            n_ubatch=n_ubatch,
+            # Map the weights instead of copying them, so they are paged in on
+            # demand and shared with other processes through the page cache.
+            use_mmap=True,
+            use_mlock=False,
             verbose=False,
         )
+    return ChatOpenAI(model=model_name)
+
+
+# Number of expressions analyzed by a single language model request.
+LLM_BATCH_SIZE = 8
+# Remote models follow long instructions reliably and bill per token rather
+# than per request, so they get larger batches and fewer round trips.
+REMOTE_LLM_BATCH_SIZE = 20
+# Maximum number of simultaneous requests to a remote language model; can be
+# lowered with OPENAI_CONCURRENCY to fit the account's rate limits.
+LLM_CONCURRENCY = int(os.getenv("OPENAI_CONCURRENCY", "16"))
+# Appended to the prompt when several expressions are analyzed at once.
+BATCH_INSTRUCTIONS = (
+    "\nYou will be given several numbered expressions, one per line. Analyze "
+    'each of them separately and output a JSON object whose "results" list '
+    'contains one object per expression, with its number in the "index" field.'
+)
+
+
+class CardInfo(BaseModel):
+    """Card information generated by the language model for one expression."""
+
+    part_of_speech: str | None
+    definition: str | None
+    examples: list[str]
+    synonyms: list[str]
+    antonyms: list[str]
+    collocations: list[str]
+    russian: list[str]
+    cefr_level: str | None
+    topics: list[str]
+
+
+class IndexedCardInfo(CardInfo):
+    """Card information for the expression in the numbered slot ``index``."""
+
+    index: int
+
+
+class CardInfoBatch(BaseModel):
+    """Card information for several numbered expressions."""
+
+    results: list[IndexedCardInfo]
+
+
+def _complete(
+    model: Llama | ChatOpenAI,
+    prompt: str,
+    query: str,
+    schema: type[BaseModel],
+    max_tokens: int = 500,
+) -> dict[str, Any]:
+    """Send a query and the prompt to the language model and return its parsed answer.
+
+    The answer is constrained to the JSON schema of ``schema``: llama.cpp
+    samples through a grammar built from it and OpenAI returns structured
+    output, so no code fences have to be stripped from the response.
+
+    Raises:
+        ValueError: If the answer does not match the schema.
+    """
+    if isinstance(model, ChatOpenAI):
+        parsed = _remote_chain(model, prompt, schema).invoke({"query": query})
+        logger.debug("LLM response: %s", parsed)
+    else:
+        # The fixed prompt comes first and the model is not reset between calls,
+        # so llama.cpp reuses the prompt's KV cache and only evaluates the query.
         response = model.create_chat_completion(
-            messages=[
-                {
-                    "role": "user",
-                    "content": f"The expression to analyze is: ```{expression}```",
-                },
-                {"role": "assistant", "content": prompt},
-            ],
+            messages=[{"role": "user", "content": f"{prompt}\n\n{query}"}],
+            response_format={
+                "type": "json_object",
+                "schema": schema.model_json_schema(),
+            },
             temperature=0.0,
-            max_tokens=500,
+            max_tokens=max_tokens,
         )
-        answer = response["choices"][0]["message"]["content"].strip()
-        # Extract the JSON part from the response.
-        expression_card_info = (
-            answer[answer.find("json") + 4 :].replace("```", "").strip()
-        )
-    else:
-        model = ChatOpenAI(model=model_name)
-        expression_card_info = model.invoke(
-            f"The expression to analyze is: ```{expression}```" + prompt
-        ).content
-    expression_card_info = json.loads(expression_card_info)
+        answer = response["choices"][0]["message"]["content"]
+        logger.debug("LLM raw response: %s", answer)
+        parsed = schema.model_validate_json(answer)
+    card_info: dict[str, Any] = parsed.model_dump()
+    return card_info
+
+
+def _remote_chain(
+    model: ChatOpenAI, prompt: str, schema: type[BaseModel]
+) -> Runnable[dict[str, str], Any]:
+    """Chain the fixed prompt as a system message with a templated user query.
+
+    The prompt is passed as a ready message rather than a template, so braces in
+    it are kept verbatim, and it forms the same leading tokens in every request,
+    which lets the provider serve it from its prompt cache.
+    """
+    template = ChatPromptTemplate.from_messages(
+        [SystemMessage(content=prompt), ("user", "{query}")]
+    )
+    return template | model.with_structured_output(schema)
+
+
+def _postprocess_card_info(
+    expression_card_info: dict[str, Any], expression: str
+) -> dict[str, Any]:
+    """Attach the expression to the parsed card information and tidy its fields.
+
+    The schema lets the model answer null for text fields it cannot fill; those
+    become empty strings, which is what the deck and the editor expect.
+    """
     expression_card_info["expression"] = expression
+    for field in ("part_of_speech", "definition", "cefr_level"):
+        if expression_card_info.get(field) is None:
+            expression_card_info[field] = ""
     # Remove 'Language learning' from topics.
     expression_card_info["topics"] = [
         topic
-        for topic in expression_card_info["topics"]
+        for topic in expression_card_info.get("topics", [])
         if topic.lower() != "language learning"
     ]
-    if model_name.startswith("models"):
-        model.reset()
     return expression_card_info
 
 
-def generate_cards_from_words(
-    model_name, prompt: str, words_list: list[str], audio_format: str = "mp3"
-) -> list[dict]:
-    """Generate Anki cards from a list of words by creating JSON data and corresponding audio files."""
-    cards = []
-    n = len(words_list)
-    print(f"Number of words to generate cards for: {n}")
-    for idx, word in enumerate(words_list):
-        print("-/-" * 20)
-        print(f"Generating card for '{word}': {idx + 1}/{n}")
-        card_data = get_expression_card_info(model_name, prompt, word)
-        output_json_path = (
-            f"data/processed_expressions/{word.lower().replace(' ', '_')}.json"
-        )
-        with open(output_json_path, "w") as f:
-            json.dump(card_data, f, indent=4)
-        voicer = TextToSpeech()
+def _single_query(expression: str) -> str:
+    """Build the user query asking the model to analyze one expression."""
+    return f"The expression to analyze is: ```{expression}```"
 
-        # Generate audio files for the word, definition, and example.
-        audio_expression_filename = (
-            f"{word.lower().replace(' ', '_')}_expression.{audio_format}"
-        )
-        voicer.text_to_speech_elevenlabs(
-            card_data["expression"], f"data/audio/{audio_expression_filename}"
-        )
 
-        audio_definition_filename = (
-            f"{word.lower().replace(' ', '_')}_definition.{audio_format}"
-        )
-        voicer.text_to_speech_elevenlabs(
-            card_data["definition"], f"data/audio/{audio_definition_filename}"
-        )
+def _batch_query(expressions: list[str]) -> str:
+    """Build the user query asking the model to analyze several expressions.
 
-        audio_example_filename = (
-            f"{word.lower().replace(' ', '_')}_examples.{audio_format}"
-        )
-        voicer.text_to_speech_elevenlabs(
-            card_data["examples"], f"data/audio/{audio_example_filename}"
+    Each expression gets a numbered slot, e.g. ``[1] Furthermore``, which the
+    model echoes back so answers can be matched even if some are missing.
+    """
+    slots = "\n".join(
+        f"[{index}] {expression}" for index, expression in enumerate(expressions, 1)
+    )
+    return f"The expressions to analyze are:\n{slots}"
+
+
+def _parse_cards_answer(
+    answer: dict[str, Any], expressions: list[str]
+) -> list[dict[str, Any] | None]:
+    """Dispatch a batch answer back to the expressions it was generated for.
+
+    Returns one item per expression: its card information, or None if the
+    answer has no result for that expression's slot.
+    """
+    cards_info: list[dict[str, Any] | None] = [None] * len(expressions)
+    for card_info in answer["results"]:
+        index = card_info.pop("index") - 1
+        if 0 <= index < len(expressions) and cards_info[index] is None:
+            cards_info[index] = _postprocess_card_info(card_info, expressions[index])
+    return cards_info
+
+
+def get_expression_card_info(
+    model: Llama | ChatOpenAI, prompt: str, expression: str
+) -> dict[str, Any]:
+    """Generate card information for a given expression by interacting with a language model."""
+    expression_card_info = _complete(model, prompt, _single_query(expression), CardInfo)
+    return _postprocess_card_info(expression_card_info, expression)
+
+
+def get_expression_cards_batch(
+    model: Llama | ChatOpenAI, prompt: str, expressions: list[str]
+) -> list[dict[str, Any]]:
+    """Generate card information for several expressions with a single model request.
+
+    The fixed prompt is sent once for the whole batch instead of once per
+    expression. Expressions missing from the answer, or all of them if it
+    cannot be parsed, are requested separately instead.
+    """
+    if len(expressions) == 1:
+        return [get_expression_card_info(model, prompt, expressions[0])]
+
+    try:
+        answer = _complete(
+            model,
+            prompt + BATCH_INSTRUCTIONS,
+            _batch_query(expressions),
+            CardInfoBatch,
+            max_tokens=500 * len(expressions),
         )
+        cards_info = _parse_cards_answer(answer, expressions)
+    except ValueError:
+        cards_info = [None] * len(expressions)
 
-        audio_collocations_filename = (
-            f"{word.lower().replace(' ', '_')}_collocations.{audio_format}"
+    missing = cards_info.count(None)
+    if missing:
+        logger.warning(
+            f"Batch answer is missing {missing} expressions, retrying one by one"
         )
-        voicer.text_to_speech_elevenlabs(
-            card_data["collocations"], f"data/audio/{audio_collocations_filename}"
+    return [
+        card_info or get_expression_card_info(model, prompt, expression)
+        for card_info, expression in zip(cards_info, expressions, strict=True)
+    ]
+
+
+def _iter_remote_cards_info(
+    model: ChatOpenAI, prompt: str, batches: list[list[str]]
+) -> Iterator[tuple[list[str], list[dict[str, Any]]]]:
+    """Request card information for all batches concurrently from a remote model.
+
+    Yields the words of each batch together with their card information as
+    soon as its answer arrives, so cards can be shown and voiced while other
+    batches are still pending. Expressions missing from a batch answer are
+    requested one by one. Those that still fail are logged and left out, so
+    one failing request does not lose the cards of the whole run.
+    """
+    config: RunnableConfig = {"max_concurrency": LLM_CONCURRENCY}
+    batch_chain = _remote_chain(model, prompt + BATCH_INSTRUCTIONS, CardInfoBatch)
+    single_chain = _remote_chain(model, prompt, CardInfo)
+    answers = batch_chain.batch_as_completed(
+        [{"query": _batch_query(batch)} for batch in batches],
+        config=config,
+        return_exceptions=True,
+    )
+    n = sum(len(batch) for batch in batches)
+    done = 0
+    for index, answer in answers:
+        batch = batches[index]
+        cards_info: list[dict[str, Any] | None] = (
+            [None] * len(batch)
+            if isinstance(answer, Exception)
+            else _parse_cards_answer(answer.model_dump(), batch)
         )
 
-        audio_synonyms_filename = (
-            f"{word.lower().replace(' ', '_')}_synonyms.{audio_format}"
+        failed = [
+            expression
+            for card_info, expression in zip(cards_info, batch, strict=True)
+            if card_info is None
+        ]
+        if failed:
+            logger.warning(f"Retrying {len(failed)} expressions one by one")
+            retried = single_chain.batch(
+                [{"query": _single_query(expression)} for expression in failed],
+                config=config,
+                return_exceptions=True,
+            )
+            retried_info = {}
+            for retried_answer, expression in zip(retried, failed, strict=True):
+                if isinstance(retried_answer, Exception):
+                    logger.error(
+                        f"Failed to generate card info for '{expression}': "
+                        f"{retried_answer}"
+                    )
+                else:
+                    retried_info[expression] = _postprocess_card_info(
+                        retried_answer.model_dump(), expression
+                    )
+            cards_info = [
+                card_info or retried_info.get(expression)
+                for card_info, expression in zip(cards_info, batch, strict=True)
+            ]
+
+        done += len(batch)
+        logger.info(f"Generated cards for {batch}: {done}/{n}")
+        generated = [
+            (expression, card_info)
+            for expression, card_info in zip(batch, cards_info, strict=True)
+            if card_info is not None
+        ]
+        yield [word for word, _ in generated], [card for _, card in generated]
+
+
+# Local model loaded once in each worker process of _get_local_cards_info_parallel.
+_worker_model: Llama | None = None
+
+
+def _init_llm_worker(model_path: str, n_threads: int) -> None:
+    """Load the local model in a worker process."""
+    global _worker_model
+    _worker_model = load_model(model_path, n_threads=n_threads)
+
+
+def _llm_worker(prompt: str, batch: list[str]) -> list[dict[str, Any]]:
+    """Generate card information for a batch with the worker's model."""
+    return get_expression_cards_batch(_worker_model, prompt, batch)
+
+
+def _get_local_cards_info_parallel(
+    model_path: str, prompt: str, batches: list[list[str]], workers: int
+) -> Iterator[list[dict[str, Any]]]:
+    """Generate card information with several processes, each running the local model.
+
+    CPU threads are split evenly between the workers. The weights are memory
+    mapped, so the processes share them through the page cache. Yields the
+    card information of each batch, in order, as soon as it is available.
+
+    Workers are spawned rather than forked: the caller runs this in a thread
+    of a multi-threaded process, which may also hold a loaded model, and
+    forking such a process can deadlock the child.
+    """
+    workers = max(1, min(workers, len(batches)))
+    n_threads = max(1, available_cpus() // workers)
+    logger.info(f"Running the local model in {workers} processes")
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_llm_worker,
+        initargs=(model_path, n_threads),
+    ) as executor:
+        yield from executor.map(_llm_worker, itertools.repeat(prompt), batches)
+
+
+# Runs of characters that are not safe in file names.
+_UNSAFE_FILENAME_RE = re.compile(r"\W+")
+
+
+def _slugify(word: str) -> str:
+    """Turn a word or expression into a string that is safe to use in file names."""
+    slug = _UNSAFE_FILENAME_RE.sub("_", word.lower()).strip("_")
+    # Expressions made only of punctuation still need a distinct name.
+    return slug or hashlib.blake2b(word.encode(), digest_size=6).hexdigest()
+
+
+# Card fields that get a voiced audio file, in the order they are synthesized.
+AUDIO_FIELDS = ("expression", "definition", "examples", "collocations", "synonyms")
+# Maximum number of simultaneous text-to-speech requests.
+TTS_CONCURRENCY = 8
+# Text-to-speech services that can voice the cards.
+TTS_ENGINES = ("elevenlabs", "gtts")
+
+
+def _audio_text(value: str | list[str] | None) -> str:
+    """Return the text to voice for a card field value."""
+    if isinstance(value, list):
+        return " ".join(value)
+    return value or ""
+
+
+async def _synthesize(
+    voicer: TextToSpeech,
+    text: str,
+    audio_format: str,
+    semaphore: asyncio.Semaphore,
+    tts_engine: str = "elevenlabs",
+) -> str:
+    """Run a single text-to-speech request, bounded by the shared semaphore."""
+    async with semaphore:
+        if tts_engine == "gtts":
+            return await voicer.text_to_speech_gtts_async(text)
+        return await voicer.text_to_speech_elevenlabs_async(
+            text, audio_format=audio_format
         )
-        voicer.text_to_speech_elevenlabs(
-            card_data["synonyms"], f"data/audio/{audio_synonyms_filename}"
+
+
+def _card_texts(cards: list[dict[str, Any]]) -> list[str]:
+    """Return the texts to voice for the audio fields of the cards."""
+    return [
+        text
+        for card_data in cards
+        for field in AUDIO_FIELDS
+        if (text := _audio_text(card_data.get(field)))
+    ]
+
+
+def _cards_dir(model: Llama | ChatOpenAI | str, prompt: str) -> str:
+    """Return the directory holding the cards generated by a model and prompt.
+
+    The directory is named after a hash of the model and the prompt (which
+    includes the context), so changing either generates the cards anew instead
+    of reusing ones made for a different setup.
+    """
+    if isinstance(model, str):
+        model_id = model
+    elif isinstance(model, ChatOpenAI):
+        model_id = model.model_name
+    else:
+        model_id = model.model_path
+    key = f"{model_id}|{prompt}".encode()
+    digest = hashlib.blake2b(key, digest_size=8).hexdigest()
+    cards_dir = os.path.join("data/processed_expressions", digest)
+    os.makedirs(cards_dir, exist_ok=True)
+    return cards_dir
+
+
+def _card_json_path(cards_dir: str, word: str) -> str:
+    """Return the path of the JSON file holding the generated data of a word."""
+    return os.path.join(cards_dir, f"{_slugify(word)}.json")
+
+
+def _save_cards(cards_dir: str, words: list[str], cards: list[dict[str, Any]]) -> None:
+    """Write the generated data of each word to its JSON file."""
+    for word, card_data in zip(words, cards, strict=True):
+        with open(_card_json_path(cards_dir, word), "wb") as f:
+            f.write(orjson.dumps(card_data, option=orjson.OPT_INDENT_2))
+
+
+def _iter_new_cards(
+    model: Llama | ChatOpenAI | str,
+    prompt: str,
+    batches: list[list[str]],
+    llm_workers: int,
+) -> Iterator[tuple[list[str], list[dict[str, Any]]]]:
+    """Generate card information batch by batch with the model.
+
+    Yields each group of words together with their card information as soon as
+    the model has produced it.
+    """
+    n = sum(len(batch) for batch in batches)
+    # A model given by its path is only loaded in the worker processes.
+    use_workers = isinstance(model, str) or (llm_workers > 1 and len(batches) > 1)
+    if isinstance(model, ChatOpenAI):
+        if batches:
+            # Remote models handle concurrent requests well, so send all batches
+            # at once instead of waiting for each answer in turn.
+            yield from _iter_remote_cards_info(model, prompt, batches)
+    elif use_workers and batches:
+        model_path = model if isinstance(model, str) else model.model_path
+        results = _get_local_cards_info_parallel(
+            model_path, prompt, batches, llm_workers
         )
+        yield from zip(batches, results, strict=True)
+    elif not isinstance(model, str):
+        done = 0
+        for batch in batches:
+            done += len(batch)
+            logger.info(f"Generating cards for {batch}: {done}/{n}")
+            yield batch, get_expression_cards_batch(model, prompt, batch)
 
-        # Add audio tags to the card data.
-        card_data["audio_expression"] = f"[sound:{audio_expression_filename}]"
-        card_data["audio_definition"] = f"[sound:{audio_definition_filename}]"
-        card_data["audio_examples"] = f"[sound:{audio_example_filename}]"
-        card_data["audio_collocations"] = f"[sound:{audio_collocations_filename}]"
-        card_data["audio_synonyms"] = f"[sound:{audio_synonyms_filename}]"
 
-        cards.append(card_data)
-    return cards
+async def _generate_cards_and_audio(
+    new_cards: Iterator[tuple[list[str], list[dict[str, Any]]]],
+    cards_by_word: dict[str, dict[str, Any]],
+    cards_dir: str,
+    audio_format: str,
+    tts_concurrency: int = TTS_CONCURRENCY,
+    tts_engine: str = "elevenlabs",
+    on_cards: Callable[[list[dict[str, Any]]], None] | None = None,
+) -> dict[str, str]:
+    """Generate the missing cards and voice all cards, overlapping the two phases.
 
+    The model runs in a worker thread. Audio requests for the cards of each
+    batch start as soon as the model returns it, so text-to-speech proceeds
+    while later batches are still being generated. New cards are saved to
+    ``cards_dir`` and added to ``cards_by_word``. Each distinct text is synthesized once.
+    ``on_cards`` is called in the calling thread with the cards loaded from disk
+    and then with each generated batch, e.g. to report progress.
+    Returns the audio path of every voiced text.
+    """
+    voicer = TextToSpeech()
+    semaphore = asyncio.Semaphore(tts_concurrency)
+    tasks = {}
 
-if __name__ == "__main__":
+    def schedule(cards: list[dict[str, Any]]) -> None:
+        for text in _card_texts(cards):
+            if text not in tasks:
+                tasks[text] = asyncio.create_task(
+                    _synthesize(voicer, text, audio_format, semaphore, tts_engine)
+                )
+
+    try:
+        cached_cards = list(cards_by_word.values())
+        schedule(cached_cards)
+        if on_cards and cached_cards:
+            on_cards(cached_cards)
+        while result := await asyncio.to_thread(next, new_cards, None):
+            words, cards = result
+            schedule(cards)
+            # Saving runs off the event loop so audio downloads keep streaming.
+            await asyncio.to_thread(_save_cards, cards_dir, words, cards)
+            cards_by_word.update(zip(words, cards, strict=True))
+            if on_cards:
+                on_cards(cards)
+
+        logger.info(f"Waiting for audio of {len(tasks)} texts")
+        results = await asyncio.gather(*tasks.values(), return_exceptions=True)
+    finally:
+        await voicer.aclose()
+        voicer.close()
+
+    paths: dict[str, str] = {}
+    for text, path in zip(tasks, results, strict=True):
+        if isinstance(path, BaseException):
+            logger.error(f"Failed to generate audio for '{text[:50]}': {path}")
+        elif path:
+            paths[text] = path
+    return paths
+
+
+def _add_audio_tags(cards: list[dict[str, Any]], paths: dict[str, str]) -> list[str]:
+    """Add audio tags to the card fields that were voiced.
+
+    Returns the paths of all audio files referenced by the cards.
+    """
+    media_files = []
+    for card_data in cards:
+        for field in AUDIO_FIELDS:
+            path = paths.get(_audio_text(card_data.get(field)))
+            if path:
+                card_data[f"audio_{field}"] = f"[sound:{os.path.basename(path)}]"
+                media_files.append(path)
+    return list(dict.fromkeys(media_files))
+
+
+def generate_cards_from_words(
+    model: Llama | ChatOpenAI | str,
+    prompt: str,
+    words_list: list[str],
+    audio_format: str = "mp3",
+    batch_size: int | None = None,
+    llm_workers: int = 1,
+    tts_concurrency: int = TTS_CONCURRENCY,
+    tts_engine: str = "elevenlabs",
+    on_cards: Callable[[list[dict[str, Any]]], None] | None = None,
+) -> tuple[list[dict[str, Any]], list[str]]:
+    """Generate Anki cards from a list of words by creating JSON data and corresponding audio files.
+
+    Words whose JSON file already exists for this model and prompt are loaded
+    from disk instead of being sent to the language model again, so
+    interrupted runs can resume and repeated words cost nothing.
+    Words are sent to the model ``batch_size`` at a time, by default
+    ``LLM_BATCH_SIZE`` for local and ``REMOTE_LLM_BATCH_SIZE`` for remote models.
+    With ``llm_workers`` above 1, a local model is run in that many processes.
+    ``model`` may then be the path of the local model, so it is only loaded
+    in the worker processes and not in the calling one.
+    Audio is voiced by ``tts_engine`` (one of ``TTS_ENGINES``), with at most
+    ``tts_concurrency`` text-to-speech requests in flight at once.
+    ``on_cards`` is called with the cards as they become available, before
+    their audio is ready. Words the model fails to generate card information
+    for are logged and left out.
+
+    Returns the cards and the paths of the audio files they refer to.
+    """
+    cards_dir = _cards_dir(model, prompt)
+    cards_by_word = {}
+    for word in words_list:
+        output_json_path = _card_json_path(cards_dir, word)
+        if os.path.exists(output_json_path):
+            with open(output_json_path, "rb") as f:
+                cards_by_word[word] = orjson.loads(f.read())
+
+    missing_words = list(dict.fromkeys(w for w in words_list if w not in cards_by_word))
+    n = len(missing_words)
+    logger.info(
+        f"Number of words to generate cards for: {n} "
+        f"({len(cards_by_word)} already processed)"
+    )
+    if batch_size is None:
+        batch_size = LLM_BATCH_SIZE if _is_local(model) else REMOTE_LLM_BATCH_SIZE
+    batches = [
+        missing_words[start : start + batch_size] for start in range(0, n, batch_size)
+    ]
+
+    # Generate the missing cards and audio for the word, definition, examples, etc.
+    new_cards = _iter_new_cards(model, prompt, batches, llm_workers)
+    paths = asyncio.run(
+        _generate_cards_and_audio(
+            new_cards,
+            cards_by_word,
+            cards_dir,
+            audio_format,
+            tts_concurrency,
+            tts_engine,
+            on_cards,
+        )
+    )
+
+    # Words the model failed to generate cards for are left out.
+    cards = [cards_by_word[word] for word in words_list if word in cards_by_word]
+    return cards, _add_audio_tags(cards, paths)
+
+
+def main() -> None:
+    """Generate an Anki deck from the command line."""
     parser = argparse.ArgumentParser(description="Generate Anki cards from words.")
     group = parser.add_mutually_exclusive_group(required=True)
     group.add_argument(
@@ -187,39 +720,59 @@ if __name__ == "__main__":
         "--model",
         type=str,
         default="models/gemma-2-2b-it-Q8_0.gguf",
-        help="Path to the model file.",
+        help="Path to a GGUF model file or the name of an OpenAI model.",
+    )
+    parser.add_argument(
+        "--llm_workers",
+        type=int,
+        default=1,
+        help="Number of processes running a local model in parallel (default: 1).",
+    )
+    parser.add_argument(
+        "--tts_concurrency",
+        type=int,
+        default=TTS_CONCURRENCY,
+        help="Maximum number of simultaneous text-to-speech requests "
+        f"(default: {TTS_CONCURRENCY}).",
+    )
+    parser.add_argument(
+        "--tts",
+        choices=TTS_ENGINES,
+        default="elevenlabs",
+        help="Text-to-speech service used to voice the cards (default: elevenlabs).",
     )
 
     args = parser.parse_args()
 
     words = parse_words(args)
-    print("Words to process:", words)
-
-    # Model configuration.
-    device = "mps"
-    n_gpu_layers = 8
-    model_path = args.model
-    model = Llama(
-        model_path=model_path,
-        n_ctx=8192,
-        device=device,
-        n_gpu_layers=n_gpu_layers if device in ("mps", "cuda") else 0,
-        verbose=False,
-    )
+    logger.info(f"Words to process: {words}")
+
+    # The model is loaded once and reused for every word. Worker processes
+    # load their own copy, so it is not loaded here when they are used.
+    if args.llm_workers > 1 and args.model.startswith("models"):
+        model = args.model
+    else:
+        model = load_model(args.model)
+    prompt = load_prompt()
 
-    cards_data = generate_cards_from_words(model, words, audio_format=args.audio_format)
-    print("Done generating cards.")
-    print("len(cards_data):", len(cards_data))
+    cards_data, media_files = generate_cards_from_words(
+        model,
+        prompt,
+        words,
+        audio_format=args.audio_format,
+        llm_workers=args.llm_workers,
+        tts_concurrency=args.tts_concurrency,
+        tts_engine=args.tts,
+    )
+    logger.info(f"Done generating {len(cards_data)} cards")
     my_deck = create_anki_deck(cards_data, deck_name=args.deck_name)
 
-    # Export Anki deck package.
-    package = genanki.Package(my_deck)
-    audio_folder = "data/audio"
-    package.media_files = [
-        os.path.join(audio_folder, f)
-        for f in os.listdir(audio_folder)
-        if f.endswith(args.audio_format)
-    ]
+    # Export Anki deck package with only the audio used by these cards.
+    package = AnkiPackage(my_deck, media_files=media_files)
 
     package.write_to_file(args.output)
-    print("Deck created with", len(cards_data), "words (1 card each).")
+    logger.info(f"Deck created with {len(cards_data)} words (1 card each)")
+
+
+if __name__ == "__main__":
+    main()
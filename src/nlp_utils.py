@@ -1,6 +1,8 @@
 """NLP utilities for the Anki Card Generator."""
 
 import argparse
+import contextlib
+import functools
 import re
 import unicodedata
 from collections import Counter
@@ -14,18 +16,27 @@ try:
     from .logger import get_logger
 except ImportError:
     # Fallback for script execution
-    from src.exceptions import FileProcessingError  # type: ignore
-    from src.logger import get_logger  # type: ignore
-
-# Download required NLTK data
-try:
-    nltk.download("stopwords", quiet=True)
-    nltk.download("punkt", quiet=True)
-except Exception:
-    pass  # Fail silently if NLTK download fails
+    from src.exceptions import FileProcessingError
+    from src.logger import get_logger
+
+# Download required NLTK data unless it is already installed
+for _package, _resource in (
+    ("stopwords", "corpora/stopwords"),
+    ("punkt", "tokenizers/punkt"),
+):
+    try:
+        nltk.data.find(_resource)
+    except LookupError:
+        # Fail silently if NLTK download fails
+        with contextlib.suppress(Exception):
+            nltk.download(_package, quiet=True)
 
 logger = get_logger(__name__)
 
+# Runs of punctuation removed by clean_text; apostrophes are kept.
+_PUNCTUATION_RE = re.compile(r"[^\w\s']+")
+_WHITESPACE_RE = re.compile(r"\s+")
+
 
 def parse_words(args: argparse.Namespace) -> list[str]:
     """Parse the words either from a comma-separated string or from a file path.
@@ -34,7 +45,7 @@ def parse_words(args: argparse.Namespace) -> list[str]:
         args: Command line arguments containing words or file path
 
     Returns:
-        List of parsed words
+        List of unique, case-folded words in order of first appearance
 
     Raises:
         ValueError: If neither words nor file is provided
@@ -44,12 +55,17 @@ def parse_words(args: argparse.Namespace) -> list[str]:
         words = []
         if args.words:
             # Assume comma-separated words.
-            words = [word.strip() for word in args.words.split(",") if word.strip()]
+            words = args.words.split(",")
         elif args.file:
             words = parse_file(args.file)
         else:
             raise ValueError("Either --words or --file must be provided.")
 
+        # Case-fold and drop repeated words so each one is processed only once.
+        words = list(
+            dict.fromkeys(word.strip().casefold() for word in words if word.strip())
+        )
+
         logger.info(f"Successfully parsed {len(words)} words")
         return words
 
@@ -84,13 +100,9 @@ def parse_file(file_input: str | TextIO) -> list[str]:
             with open(file_input, encoding="utf-8") as f:
                 content = f.read()
 
-        words = []
-        # Split content into lines, then by commas, stripping whitespace.
-        for line in content.splitlines():
-            for word in line.split():
-                clean_word = word.strip().rstrip(",.")
-                if clean_word:
-                    words.append(clean_word)
+        # Split content by any whitespace, including line breaks, and strip
+        # trailing commas and periods.
+        words = [word for word in (w.rstrip(",.") for w in content.split()) if word]
 
         logger.debug(f"Parsed {len(words)} words from file")
         return words
@@ -102,16 +114,18 @@ def parse_file(file_input: str | TextIO) -> list[str]:
 
 def clean_text(text: str) -> str:
     """Clean and preprocess text data."""
-    # Normalize unicode characters
-    text = unicodedata.normalize("NFKD", text)
-    # Convert to lowercase
-    text = text.lower()
+    # Normalize unicode characters and convert to lowercase
+    text = unicodedata.normalize("NFKD", text).lower()
     # Remove punctuation (you can adjust the regex to keep certain characters)
-    text = re.sub(r"[^\w\s']", "", text)
+    text = _PUNCTUATION_RE.sub("", text)
     # Remove extra whitespace
-    text = re.sub(r"\s+", " ", text).strip()
+    return _WHITESPACE_RE.sub(" ", text).strip()
 
-    return text
+
+@functools.cache
+def _default_stopwords() -> frozenset[str]:
+    """Load the NLTK English stopwords once."""
+    return frozenset(nltk.corpus.stopwords.words("english"))
 
 
 def filter_tokens(
@@ -120,32 +134,26 @@ def filter_tokens(
     """Filter tokens based on stopwords and minimum length."""
     if stopwords is None:
         # Default stopwords from NLTK
-        stopwords = set(nltk.corpus.stopwords.words("english"))
+        stopwords = _default_stopwords()
 
-    filtered = []
-    for token in tokens:
-        # Filter out numbers or tokens that are too short
-        if token.isdigit() or len(token) < min_length:
-            continue
-        # Optionally filter stopwords
-        if token in stopwords:
-            continue
-        filtered.append(token)
-    return filtered
+    # Filter out numbers, tokens that are too short and stopwords
+    return [
+        token
+        for token in tokens
+        if len(token) >= min_length and not token.isdigit() and token not in stopwords
+    ]
 
 
 def extract_ngrams(tokens: list[str], n: int = 2, min_freq: int = 2) -> list[str]:
     """Extract n-grams from a list of tokens."""
-    ngrams = zip(*[tokens[i:] for i in range(n)], strict=False)
-    ngrams = [" ".join(gram) for gram in ngrams]
-    freq = Counter(ngrams)
+    # Count token tuples and only join the n-grams that are returned
+    freq = Counter(zip(*[tokens[i:] for i in range(n)], strict=False))
     # Return n-grams that occur at least min_freq times
-    return [ng for ng, count in freq.items() if count >= min_freq]
+    return [" ".join(gram) for gram, count in freq.items() if count >= min_freq]
 
 
 def prepare_flashcard_candidates(file_input, stopwords: set = None):
     """Prepare flashcard candidates from a file input."""
-    st.spinner("Prepare flashcard candidates...")
     # Assume parse_file handles both file path and stream uploader
     raw_content = parse_file(file_input)
     st.info(f"Number of words in the file: {len(raw_content)}")
@@ -167,9 +175,7 @@ def prepare_flashcard_candidates(file_input, stopwords: set = None):
     # Remove candidates with less than 3 characters
     filtered_tokens = [token for token in filtered_tokens if len(token) > 3]
 
-    # Remove duplicate words
-    text = " ".join(sorted(set(text.split()), key=text.split().index))
-
-    flashcard_candidates = bi_grams + tri_grams + filtered_tokens
+    # Remove duplicate candidates, keeping the order of first appearance
+    flashcard_candidates = list(dict.fromkeys(bi_grams + tri_grams + filtered_tokens))
 
     return ", ".join(flashcard_candidates)
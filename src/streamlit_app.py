@@ -5,15 +5,24 @@ to derive card details and a text-to-speech service to create corresponding audi
 It produces JSON files with card data and an Anki package that includes audio references.
 """
 
+import contextlib
 import glob
-import json
+import hashlib
+import io
 import os
 import random
+import re
+import threading
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
 
-import genanki
+import orjson
 import streamlit as st
 import streamlit.components.v1 as components
 
+if TYPE_CHECKING:
+    from collections.abc import Iterable
+
 # ---------------------------------------------------------------------------
 # Import project modules
 # ---------------------------------------------------------------------------
@@ -32,10 +41,16 @@ import streamlit.components.v1 as components
 
 try:
     # Package-relative imports (work when ``src`` is recognised as a package)
-    from .anki_utils import create_anki_deck
+    from .anki_utils import AnkiPackage, create_anki_deck
     from .config import config
     from .logger import get_logger
-    from .main import AnkiCardsGenerator, load_prompt
+    from .main import (
+        TTS_CONCURRENCY,
+        available_cpus,
+        generate_cards_from_words,
+        load_model,
+        load_prompt,
+    )
     from .nlp_utils import prepare_flashcard_candidates
     from .streamlit_utils import render_phone_preview
 except (ImportError, SystemError):  # Fallback for "script" execution mode
@@ -52,17 +67,141 @@ except (ImportError, SystemError):  # Fallback for "script" execution mode
 
     # Now import via the *package* path so that intra-package relative imports
     # (e.g. ``from .exceptions import ...`` inside other modules) keep working.
-    from src.anki_utils import create_anki_deck  # type: ignore
-    from src.config import config  # type: ignore
-    from src.logger import get_logger  # type: ignore
-    from src.main import AnkiCardsGenerator, load_prompt  # type: ignore
-    from src.nlp_utils import prepare_flashcard_candidates  # type: ignore
-    from src.streamlit_utils import render_phone_preview  # type: ignore
+    from src.anki_utils import AnkiPackage, create_anki_deck
+    from src.config import config
+    from src.logger import get_logger
+    from src.main import (
+        TTS_CONCURRENCY,
+        available_cpus,
+        generate_cards_from_words,
+        load_model,
+        load_prompt,
+    )
+    from src.nlp_utils import prepare_flashcard_candidates
+    from src.streamlit_utils import render_phone_preview
 
 logger = get_logger(__name__)
 
+CEFR_LEVELS = ("A1", "A2", "B1", "B2", "C1", "C2", "?")
+CEFR_INDEX = {level: i for i, level in enumerate(CEFR_LEVELS)}
+
+
+@st.cache_resource(max_entries=1, show_spinner="Loading the model...")
+def get_local_model(
+    model_path: str, n_batch: int = 2048, n_threads: int | None = None
+) -> tuple[Any, threading.Lock]:
+    """Return a local model shared across reruns and sessions, with its lock.
+
+    The model is cached by its path and settings, so it is only loaded again
+    when one of them changes, not on every click. A llama.cpp context must not
+    be used from two threads at once, so sessions hold the lock while
+    generating.
+    """
+    model = load_model(model_path, n_threads=n_threads, n_batch=n_batch)
+    return model, threading.Lock()
+
+
+@st.cache_data
+def cached_prompt(mtime: float) -> str:
+    """Load the prompt once per modification time of the prompt file."""
+    return load_prompt()
+
+
+@st.cache_data
+def model_options(mtime: float) -> list[str]:
+    """List the local models once per modification time of ``models/``."""
+    # 4- and 5-bit K-quants read far less memory per token than Q8_0 at a small
+    # quality cost, so they are listed (and selected by default) first.
+    models = sorted(
+        glob.glob("models/*.gguf"),
+        key=lambda path: ("Q4_K_M" not in path and "Q5_K_M" not in path, path),
+    )
+    return models + ["gpt-4o-mini"]
+
+
+def package_path(
+    cards: list[dict[str, Any]], deck_name: str, media_files: list[str]
+) -> Path:
+    """Return the path of the ``.apkg`` package for the cards.
+
+    The name is a hash of the card data, deck name and media paths. Audio files
+    are named after the voiced text, so unchanged inputs mean an identical deck,
+    which is then served from disk instead of being zipped again.
+    """
+    key = orjson.dumps([cards, deck_name, media_files])
+    digest = hashlib.blake2b(key, digest_size=8).hexdigest()
+    path: Path = config.anki_decks_dir / f"cards-{digest}.apkg"
+    return path
+
+
+def remove_other_packages(keep: Path) -> None:
+    """Delete the packages of earlier decks, keeping only ``keep``.
+
+    Only the latest deck can be reused by the next click, so older packages
+    would otherwise pile up while the cards are edited and regenerated.
+    """
+    for path in keep.parent.glob("cards-*.apkg"):
+        if path != keep:
+            path.unlink(missing_ok=True)
+
+
+def build_package(
+    cards: list[dict[str, Any]],
+    deck_name: str,
+    media_files: list[str],
+    output_path: Path,
+) -> None:
+    """Write the ``.apkg`` package for the cards to ``output_path``.
+
+    Media is streamed from disk into the archive, so the package is never
+    held in memory as a whole while it is built. The package is written to a
+    temporary file first, so an interrupted build is not mistaken for a
+    finished one.
+    """
+    my_deck = create_anki_deck(cards, deck_name=deck_name)
+    # Export Anki deck package with only the audio used by these cards.
+    package = AnkiPackage(my_deck, media_files=media_files)
+    partial_path = output_path.with_name(f"{output_path.name}.part")
+    package.write_to_file(partial_path)
+    os.replace(partial_path, output_path)
+
+
+@st.cache_data(show_spinner=False)
+def cached_candidates(file_bytes: bytes) -> str:
+    """Extract flashcard candidates once per distinct uploaded file content."""
+    candidates: str = prepare_flashcard_candidates(io.BytesIO(file_bytes))
+    return candidates
+
+
+# Comma together with the whitespace around it, splitting comma-separated fields.
+_COMMA_SPLIT_RE = re.compile(r"\s*,\s*")
+
+
+def set_list_field(
+    card: dict[str, Any], index: int, field: str, raw: str, lines: bool = False
+) -> None:
+    """Parse the text of an editor box into a list field of the card at ``index``.
+
+    The text is split at commas, or into lines with ``lines=True``. The last
+    parsed text of each field is kept in the session state, so reruns caused by
+    other widgets do not split and strip unchanged text again. It is keyed on
+    the card's position and expression, and cleared whenever cards are
+    replaced or removed, so it never applies to a different card.
+    """
+    raw_fields = st.session_state.setdefault("raw_fields", {})
+    key = (index, card.get("expression"), field)
+    if raw_fields.get(key) == raw:
+        return
+    raw_fields[key] = raw
+    parts: Iterable[str]
+    if lines:
+        parts = (line.strip() for line in raw.splitlines())
+    else:
+        parts = _COMMA_SPLIT_RE.split(raw.strip())
+    card[field] = [part for part in parts if part]
+
 
-def main():
+def main() -> None:
     """Streamlit app for generating Anki flashcards."""
     st.set_page_config(
         page_title="Anki Cards Creator", layout="wide", initial_sidebar_state="expanded"
@@ -75,7 +214,7 @@ def main():
         st.session_state.current_card_index = 0
 
     try:
-        prompt = load_prompt()
+        prompt = cached_prompt(os.path.getmtime("prompts/prompt.json"))
     except Exception as e:
         logger.error(f"Failed to load prompt: {e}")
         st.error(f"❌ Failed to load prompt: {e}")
@@ -86,7 +225,9 @@ def main():
     deck_name = st.sidebar.text_input("Deck Name", value="IELTS Vocabulary")
     model_path = st.sidebar.selectbox(
         "Model",
-        options=glob.glob("models/*.gguf") + ["gpt-4o-mini"],
+        options=model_options(
+            os.path.getmtime("models") if os.path.isdir("models") else 0.0
+        ),
         index=0,
     )
     audio_model_path = st.sidebar.selectbox(
@@ -101,6 +242,24 @@ def main():
     if model_path == "gpt-4o-mini":
         openai_api_key = st.sidebar.text_input("OpenAI API Key")
         os.environ["OPENAI_API_KEY"] = openai_api_key
+    else:
+        cpu_count = available_cpus()
+        default_threads = max(1, cpu_count // 2)
+        n_batch = st.sidebar.number_input(
+            "Batch Size",
+            min_value=1,
+            max_value=4096,
+            value=2048,
+            help="Prompt tokens evaluated per step by llama.cpp.",
+        )
+        n_threads = st.sidebar.number_input(
+            "CPU Threads",
+            min_value=1,
+            max_value=cpu_count,
+            value=default_threads,
+            help="Threads generating tokens. Left at the default, prompt "
+            "evaluation uses all available CPUs.",
+        )
 
     input_method = st.sidebar.selectbox(
         "Input method",
@@ -115,7 +274,8 @@ def main():
         )
         default_words = "Furthermore, Moreover, In addition to this"
         if uploaded_file is not None:
-            parsed_words = prepare_flashcard_candidates(uploaded_file)
+            with st.spinner("Preparing flashcard candidates..."):
+                parsed_words = cached_candidates(uploaded_file.getvalue())
             if isinstance(parsed_words, list):
                 default_words = ", ".join(parsed_words)
             else:
@@ -128,7 +288,9 @@ def main():
         )
 
         if words_input:
-            words = [word.strip() for word in words_input.split(",") if word.strip()]
+            words = [
+                word for word in _COMMA_SPLIT_RE.split(words_input.strip()) if word
+            ]
         st.sidebar.write(f"Words to process: {len(words)}")
 
     context_field = st.sidebar.text_area(
@@ -144,6 +306,13 @@ def main():
 
     # Additional settings.
     audio_format = st.sidebar.selectbox("Audio Format", options=["mp3", "wav"], index=0)
+    tts_concurrency = st.sidebar.number_input(
+        "TTS Concurrency",
+        min_value=1,
+        max_value=64,
+        value=TTS_CONCURRENCY,
+        help="Maximum number of simultaneous text-to-speech requests.",
+    )
     # device = st.sidebar.selectbox("Device", options=["mps", "cpu", "cuda"], index=0)
 
     # Button to start generation.
@@ -152,31 +321,71 @@ def main():
             st.error("Please provide some words either via text input or file upload.")
             return  # Initialize the generator and create cards.
         try:
-            generator = AnkiCardsGenerator()
-            st.session_state.flashcards = generator.generate_cards_from_words(
-                model_path, prompt, words, audio_format=audio_format
-            )
+            if model_path == "gpt-4o-mini":
+                # The remote client is cheap to create and reads the API key
+                # when it is created, so it is not cached: every session uses
+                # its current key. It is also thread safe and needs no lock.
+                model = load_model(model_path)
+                model_lock: contextlib.AbstractContextManager[Any] = (
+                    contextlib.nullcontext()
+                )
+            else:
+                # Threads are only set when changed, so load_model keeps using
+                # all available CPUs for prompt evaluation by default.
+                threads = None if n_threads == default_threads else int(n_threads)
+                model, model_lock = get_local_model(model_path, int(n_batch), threads)
+
+            # Show each batch of cards as soon as the model returns it, while
+            # later batches and the audio are still being generated.
+            progress = st.progress(0.0, text="Generating cards...")
+            latest_cards = st.empty()
+            generated = []
+
+            def show_cards(cards: list[dict[str, Any]]) -> None:
+                generated.extend(cards)
+                progress.progress(
+                    min(len(generated) / len(words), 1.0),
+                    text=f"Generated {len(generated)}/{len(words)} cards",
+                )
+                latest_cards.json(cards, expanded=False)
+
+            with model_lock:
+                cards, media_files = generate_cards_from_words(
+                    model,
+                    prompt,
+                    words,
+                    audio_format=audio_format,
+                    tts_engine=audio_model_path.lower(),
+                    on_cards=show_cards,
+                    tts_concurrency=int(tts_concurrency),
+                )
+            progress.empty()
+            latest_cards.empty()
+            st.session_state.flashcards = cards
+            st.session_state.current_card_index = 0
+            # Parsed editor text belongs to the previous cards.
+            st.session_state.raw_fields = {}
 
             # Save cards data
             config.json_files_dir.mkdir(exist_ok=True)
             cards_data_path = config.json_files_dir / "cards_data.json"
-            with open(cards_data_path, "w", encoding="utf-8") as f:
-                json.dump(st.session_state.flashcards, f, indent=4, ensure_ascii=False)
-
-            # Create the Anki deck.
-            my_deck = create_anki_deck(st.session_state.flashcards, deck_name=deck_name)
-
-            # Export Anki deck package.
-            package = genanki.Package(my_deck)
-
-            # Add audio files to package
-            audio_files = list(config.audio_dir.glob(f"*.{audio_format}"))
-            package.media_files = [str(f) for f in audio_files]
+            cards_data_path.write_bytes(
+                orjson.dumps(st.session_state.flashcards, option=orjson.OPT_INDENT_2)
+            )
 
-            # Save the package
+            # Write the package straight to disk; the download button then
+            # reads it once, so only a single copy is ever held in memory. An
+            # identical deck built before is reused as is.
             config.anki_decks_dir.mkdir(exist_ok=True)
-            output_path = config.anki_decks_dir / "cards.apkg"
-            package.write_to_file(str(output_path))
+            output_path = package_path(
+                st.session_state.flashcards, deck_name, media_files
+            )
+            if not output_path.exists():
+                with st.spinner("Packaging the deck..."):
+                    build_package(
+                        st.session_state.flashcards, deck_name, media_files, output_path
+                    )
+                remove_other_packages(output_path)
 
             # Provide a download link.
             with open(output_path, "rb") as f:
@@ -203,36 +412,40 @@ def main():
         st.subheader("Edit Flashcard")
         st.markdown("---")
 
-        current_card = st.session_state.flashcards[st.session_state.current_card_index]
+        card_index = st.session_state.current_card_index
+        current_card = st.session_state.flashcards[card_index]
 
         # Edit basic text fields
         expression = st.text_input("Expression", current_card.get("expression", ""))
-        current_card["expression"] = expression
 
         part_of_speech = st.text_input(
             "Part of Speech", current_card.get("part_of_speech", "")
         )
-        current_card["part_of_speech"] = part_of_speech
 
         cefr_level = st.selectbox(
             "CEFR Level",
-            options=["A1", "A2", "B1", "B2", "C1", "C2", "?"],
-            index=["A1", "A2", "B1", "B2", "C1", "C2", "?"].index(
-                current_card.get("cefr_level", "?")
-            ),
+            options=CEFR_LEVELS,
+            # Unknown levels from the model fall back to "?".
+            index=CEFR_INDEX.get(current_card.get("cefr_level"), len(CEFR_LEVELS) - 1),
         )
-        current_card["cefr_level"] = cefr_level
 
         definition = st.text_area("Definition", current_card.get("definition", ""))
-        current_card["definition"] = definition
+
+        # Only touch the card when a field was actually edited.
+        edits = {
+            "expression": expression,
+            "part_of_speech": part_of_speech,
+            "cefr_level": cefr_level,
+            "definition": definition,
+        }
+        if any(current_card.get(key) != value for key, value in edits.items()):
+            current_card.update(edits)
 
         # For list-type fields
         examples = st.text_area(
             "Examples (one per line)", "\n".join(current_card.get("examples", []))
         )
-        current_card["examples"] = [
-            line.strip() for line in examples.splitlines() if line.strip()
-        ]
+        set_list_field(current_card, card_index, "examples", examples, lines=True)
 
         col1, col2 = st.columns(2)
 
@@ -241,43 +454,38 @@ def main():
                 "Synonyms (comma separated)",
                 ", ".join(current_card.get("synonyms", [])),
             )
-            current_card["synonyms"] = [
-                s.strip() for s in synonyms.split(",") if s.strip()
-            ]
+            set_list_field(current_card, card_index, "synonyms", synonyms)
 
             antonyms = st.text_input(
                 "Antonyms (comma separated)",
                 ", ".join(current_card.get("antonyms", [])),
             )
-            current_card["antonyms"] = [
-                a.strip() for a in antonyms.split(",") if a.strip()
-            ]
+            set_list_field(current_card, card_index, "antonyms", antonyms)
 
         with col2:
             collocations = st.text_input(
                 "Collocations (comma separated)",
                 ", ".join(current_card.get("collocations", [])),
             )
-            current_card["collocations"] = [
-                c.strip() for c in collocations.split(",") if c.strip()
-            ]
+            set_list_field(current_card, card_index, "collocations", collocations)
 
             russian = st.text_input(
                 "Russian Translations (comma separated)",
                 ", ".join(current_card.get("russian", [])),
             )
-            current_card["russian"] = [
-                r.strip() for r in russian.split(",") if r.strip()
-            ]
+            set_list_field(current_card, card_index, "russian", russian)
 
         topics = st.text_input(
             "Topics (comma separated)", ", ".join(current_card.get("topics", []))
         )
-        current_card["topics"] = [t.strip() for t in topics.split(",") if t.strip()]
+        set_list_field(current_card, card_index, "topics", topics)
 
         # Card management buttons
         st.markdown("---")
         st.subheader("Card Management")
+        # Set by the buttons below, which start over once the list changed.
+        if notice := st.session_state.pop("card_notice", None):
+            st.success(notice)
 
         col_add, col_del = st.columns(2)
         with col_add:
@@ -299,18 +507,23 @@ def main():
                 st.session_state.current_card_index = (
                     len(st.session_state.flashcards) - 1
                 )
-                st.success("New card added!")
+                st.session_state.card_notice = "New card added!"
+                st.rerun()
 
         with col_del:
             if len(st.session_state.flashcards) > 1 and st.button(
                 "Delete Current Card", use_container_width=True
             ):
                 st.session_state.flashcards.pop(st.session_state.current_card_index)
+                # Later cards moved up, so cached editor text no longer
+                # matches their positions.
+                st.session_state.raw_fields = {}
                 st.session_state.current_card_index = min(
                     st.session_state.current_card_index,
                     len(st.session_state.flashcards) - 1,
                 )
-                st.success("Card deleted!")
+                st.session_state.card_notice = "Card deleted!"
+                st.rerun()
 
     with col_preview:
         # Phone preview and Card navigation buttons
@@ -324,22 +537,24 @@ def main():
         with col3:
             btn3 = st.button("➡️", key="next_page")
 
-        current_card = st.session_state.flashcards[st.session_state.current_card_index]
-        preview_html = render_phone_preview(current_card, True)
-        components.html(preview_html, height=1000)
-
-        if btn1:
+        # Switch cards before rendering the preview, and start over so the
+        # editor and the preview are rendered once, for the new card only.
+        n_cards = len(st.session_state.flashcards)
+        if btn1 or btn3:
+            step = -1 if btn1 else 1
             st.session_state.current_card_index = (
-                st.session_state.current_card_index - 1
-            ) % len(st.session_state.flashcards)
+                st.session_state.current_card_index + step
+            ) % n_cards
+            st.rerun()
         if btn2:
-            st.session_state.current_card_index = random.randint(
-                0, len(st.session_state.flashcards) - 1
-            )
-        if btn3:
-            st.session_state.current_card_index = (
-                st.session_state.current_card_index + 1
-            ) % len(st.session_state.flashcards)
+            st.session_state.current_card_index = random.randint(0, n_cards - 1)
+            st.rerun()
+
+        current_card = st.session_state.flashcards[st.session_state.current_card_index]
+        preview_html = render_phone_preview(
+            current_card, dark_mode=True, include_audio=True
+        )
+        components.html(preview_html, height=1000)
 
 
 if __name__ == "__main__":
@@ -2,21 +2,34 @@
 
 import base64
 import datetime
+import functools
+import os
+from typing import Any
 
 
-def get_audio_base64(file_path):
+def get_audio_base64(file_path: str) -> str:
     """Read an audio file and return a base64 data URI."""
     if not file_path:
         return ""
     # Prepare the file path by removing unwanted markers
     file_path = "data/audio/" + file_path.replace("[sound:", "").replace("]", "")
+    return _encode_audio(file_path, os.stat(file_path).st_mtime_ns)
+
+
+# Keyed on the modification time as well as the path, since a file placed under
+# a caller-chosen name may be rewritten with different audio.
+@functools.lru_cache(maxsize=512)
+def _encode_audio(file_path: str, mtime_ns: int) -> str:
+    """Return the data URI of an audio file as of its modification time."""
     with open(file_path, "rb") as f:
         data = f.read()
     encoded = base64.b64encode(data).decode("utf-8")
     return f"data:audio/mpeg;base64,{encoded}"
 
 
-def get_audio_html(card, audio_key, icon_size="15px"):
+def get_audio_html(
+    card: dict[str, Any], audio_key: str, icon_size: str = "15px"
+) -> str:
     """Return HTML for a hidden audio element plus a clickable icon that toggles the audio playback.
 
     If no audio file is provided, returns an empty string.
@@ -42,25 +55,42 @@ def get_audio_html(card, audio_key, icon_size="15px"):
     return ""
 
 
-def render_phone_preview(card, dark_mode=False):
-    """Render a phone-like flashcard preview with embedded audio players for every text except Russian."""
+# Preview colors by dark mode flag: background, card background, text, accent,
+# secondary text and border.
+PREVIEW_COLORS = {
+    True: ("#121212", "#1E1E1E", "#E0E0E0", "#BB86FC", "#B0B0B0", "#333333"),
+    False: ("#F5F7FA", "#FFFFFF", "#333333", "#4F6BFF", "#6E7A8A", "#E0E6ED"),
+}
+# Markup of a single example, with the accent color of each scheme filled in
+# once so only the example text is formatted per item.
+EXAMPLE_TEMPLATES = {
+    dark_mode: (
+        '<div style="display: flex; align-items: center; '
+        f"border-left: 3px solid {colors[3]}; padding-left: 10px; "
+        'margin-bottom: 8px; font-style: italic;">{}</div>'
+    )
+    for dark_mode, colors in PREVIEW_COLORS.items()
+}
+
+
+def render_phone_preview(
+    card: dict[str, Any], dark_mode: bool = False, include_audio: bool = False
+) -> str:
+    """Render a phone-like flashcard preview.
+
+    With ``include_audio``, every text except Russian gets an embedded audio
+    player for its voiced file.
+    """
     current_time = datetime.datetime.now().strftime("%H:%M")
 
+    def audio_html(audio_key: str) -> str:
+        return get_audio_html(card, audio_key) if include_audio else ""
+
     # Set colors based on dark mode flag
-    if dark_mode:
-        bg_color = "#121212"
-        card_bg = "#1E1E1E"
-        text_color = "#E0E0E0"
-        accent_color = "#BB86FC"
-        secondary_text = "#B0B0B0"
-        border_color = "#333333"
-    else:
-        bg_color = "#F5F7FA"
-        card_bg = "#FFFFFF"
-        text_color = "#333333"
-        accent_color = "#4F6BFF"
-        secondary_text = "#6E7A8A"
-        border_color = "#E0E6ED"
+    bg_color, card_bg, text_color, accent_color, secondary_text, border_color = (
+        PREVIEW_COLORS[bool(dark_mode)]
+    )
+    example_template = EXAMPLE_TEMPLATES[bool(dark_mode)]
 
     html = f"""
     <div style="
@@ -116,7 +146,7 @@ def render_phone_preview(card, dark_mode=False):
                     margin-bottom: 5px;
                     color: {text_color};
                 ">{card.get("expression", "Untitled Card")}</div>
-                {get_audio_html(card, "audio_expression")}
+                {audio_html("audio_expression")}
             </div>
 
             <!-- Definition with audio -->
@@ -126,7 +156,7 @@ def render_phone_preview(card, dark_mode=False):
                     color: {accent_color};
                     margin-bottom: 5px;
                     font-size: 14px;
-                ">Definition{get_audio_html(card, "audio_definition")}</div>
+                ">Definition{audio_html("audio_definition")}</div>
                 <div style="display: flex; align-items: center; color: {
         text_color
     }; font-size: 15px; line-height: 1.4;">
@@ -141,14 +171,11 @@ def render_phone_preview(card, dark_mode=False):
                     color: {accent_color};
                     margin-bottom: 5px;
                     font-size: 14px;
-                ">Examples{get_audio_html(card, "audio_examples")}</div>
+                ">Examples{audio_html("audio_examples")}</div>
                 <div style="color: {text_color}; font-size: 15px; line-height: 1.4;">
                     {
         "".join(
-            f'<div style="display: flex; align-items: center; border-left: 3px solid {accent_color}; padding-left: 10px; margin-bottom: 8px; font-style: italic;">'
-            f"{example}"
-            f"</div>"
-            for example in card.get("examples", [])
+            [example_template.format(example) for example in card.get("examples", [])]
         )
     }
                 </div>
@@ -163,7 +190,7 @@ def render_phone_preview(card, dark_mode=False):
                     color: {accent_color};
                     margin-bottom: 5px;
                     font-size: 14px;
-                ">Collocations{get_audio_html(card, "audio_collocations")}</div>
+                ">Collocations{audio_html("audio_collocations")}</div>
                 <div style="display: flex; align-items: center; color: {text_color}; font-size: 15px; line-height: 1.4;">
                     <div>{", ".join(card.get("collocations", []))}</div>
                 </div>
@@ -182,7 +209,7 @@ def render_phone_preview(card, dark_mode=False):
                     color: {accent_color};
                     margin-bottom: 5px;
                     font-size: 14px;
-                ">Synonyms{get_audio_html(card, "audio_synonyms")}</div>
+                ">Synonyms{audio_html("audio_synonyms")}</div>
                 <div style="display: flex; align-items: center; color: {text_color}; font-size: 15px; line-height: 1.4;">
                     <div>{", ".join(card.get("synonyms", []))}</div>
                 </div>